@@ -1,152 +1,87 @@
 import streamlit as st
-from crewai import Agent, Task, Crew
-from langchain.chat_models import ChatOpenAI
-import os
-from docx import Document
-from crewai_tools import (
-    SerperDevTool,
-    ScrapeWebsiteTool,
+import pandas as pd
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from grant_core import (
+    create_crew,
+    parse_websites,
+    run_grant_process,
+    run_batch_process,
+    render_download,
+    generate_batch_download_link,
 )
-import io
 import sys
 import re
+import time
+import asyncio
+import threading
+from collections import deque
 
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-os.environ["SERPER_API_KEY"] =os.getenv("SERPER_API_KEY")
-
-# Initialize language models
-llm = ChatOpenAI(model_name="gpt-4o-mini")
-
-# Define tools
-tools = [SerperDevTool(), ScrapeWebsiteTool()]
+# Terminal control sequences (CSI and OSC) emitted by verbose agent output
+_TERM_RE = re.compile(r'\x1B(?:\[[0-?]*[ -/]*[@-~]|\].*?(?:\x07|\x1B\\))')
 
 class StreamToExpander:
-    def __init__(self, expander, buffer_limit=10000):
+    def __init__(self, expander, buffer_limit=10000, flush_interval=0.25, flush_bytes=4096):
         self.expander = expander
-        self.buffer = []
+        self.buffer = deque(maxlen=buffer_limit)
         self.buffer_limit = buffer_limit
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+        # Deferred render for output left over after a throttled write
+        self._timer = None
+        # Batch runs write from several worker threads at once
+        self._lock = threading.RLock()
+        # Async kickoff runs the crew in a worker thread; keep the script context
+        self._ctx = get_script_run_ctx()
 
     def write(self, data):
-        # Clean ANSI escape codes from output
-        cleaned_data = re.sub(r'\x1B\[\d+;?\d*m', '', data)
-        if len(self.buffer) >= self.buffer_limit:
-            self.buffer.pop(0)
-        self.buffer.append(cleaned_data)
+        # Clean terminal control sequences from output
+        cleaned_data = _TERM_RE.sub('', data)
+        with self._lock:
+            self.buffer.append(cleaned_data)
+            self._pending_bytes += len(cleaned_data)
 
         if "\n" in data:
-            self.expander.markdown(''.join(self.buffer), unsafe_allow_html=True)
-            self.buffer.clear()
+            self._render()
 
     def flush(self):
-        if self.buffer:
-            self.expander.markdown(''.join(self.buffer), unsafe_allow_html=True)
-            self.buffer.clear()
-
-
-def create_agents(llm):
-    """Creates and returns agents with predefined roles and goals."""
-    try:
-        researcher = Agent(
-            role='Grant Researcher',
-            goal='Find suitable grants for the organization',
-            backstory="You are an expert in finding and analyzing grant opportunities.",
-            tools=tools,
-            verbose=True,
-            llm=llm
-        )
-
-        analyzer = Agent(
-            role='Grant Analyzer',
-            goal='Analyze grant requirements and organizational fit',
-            backstory="You are an expert in analyzing grant requirements and assessing organizational eligibility.",
-            tools=tools,
-            verbose=True,
-            llm=llm
-        )
-
-        writer = Agent(
-            role='Grant Writer',
-            goal='Write compelling grant applications',
-            backstory="You are a skilled grant writer with a track record of successful applications.",
-            tools=[],
-            verbose=True,
-            llm=llm
-        )
-        return researcher, analyzer, writer
-    except Exception as e:
-        st.error(f"Error creating agents: {str(e)}")
-        return None, None, None
-
-def create_tasks(researcher, analyzer, writer):
-    """Creates and returns tasks for each agent."""
-    try:
-        research_task = Task(
-            description="Research and identify suitable grants based on the organization's profile and needs. Organization: {organization}, Mission: {mission}, Project: {project}, Funding Needed: ${funding}. Use the provided website links: {websites} if available, otherwise search randomly.",
-            agent=researcher,
-            expected_output="A list of at least 3 potential grants with their names, funding amounts, brief descriptions, website links, and application deadlines. Also give a list of Grant Websites Direct URL to grant opportunity"
-        )
-
-        analysis_task = Task(
-            description="Analyze the identified grants for eligibility and fit with the organization. Also, find and analyze similar successful grant applications from the web. Organization: {organization}, Mission: {mission}, Project: {project}, Funding Needed: ${funding}",
-            agent=analyzer,
-            expected_output="A detailed analysis of each grant, including eligibility criteria, alignment with organization goals, probability of success, and insights from similar successful applications. Also Grant Application Reference Websites URLs of successful grant application examples"
-        )
-
-        writing_task = Task(
-            description="Write a compelling grant application for the selected grant opportunity based on the requirements and analysis. Organization: {organization}, Mission: {mission}, Project: {project}, Funding Needed: ${funding}",
-            agent=writer,
-            expected_output="A comprehensive, detailed grant application draft, including an executive summary, project description, budget overview, expected outcomes, and any specific sections required by the grant guidelines. Also Source Links (URLs) of the target grant"
-        )
-        return [research_task, analysis_task, writing_task]
-    except Exception as e:
-        st.error(f"Error creating tasks: {str(e)}")
-        return []
-
-def run_grant_process(grant_crew, input_data):
-    """Runs the grant research and writing process."""
-    try:
-        with st.spinner("Processing... This may take a few minutes."):
-            result = grant_crew.kickoff(inputs=input_data)
-        st.success("Process completed!")
-        return result
-    except Exception as e:
-        st.error(f"An error occurred during the process: {str(e)}")
-        return None
-
-def generate_download_link(result):
-    """Generates a download link for the result in a Word document format."""
-    try:
-        from docx import Document  # Ensure docx is imported within the function
-
-        # Create a Word document
-        doc = Document()
-        doc.add_heading("Grant Research and Writing Results", level=1)
-
-        # Check if `result` is structured as a dictionary or a list
-        if isinstance(result, dict):
-            for section, content in result.items():
-                doc.add_heading(section, level=2)
-                doc.add_paragraph(str(content))  # Ensure content is a string
-        elif isinstance(result, (list, tuple)):
-            for item in result:
-                doc.add_paragraph(str(item))  # Convert each item to a string if needed
-        else:
-            doc.add_paragraph(str(result))  # Ensure `result` is a string if it’s a single output
-
-        # Save document to an in-memory file
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-
-        # Provide download link for Word document
-        st.download_button(
-            label="Download Results as Word Document",
-            data=buffer,
-            file_name="grant_results.docx",
-            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        )
-    except Exception as e:
-        st.error(f"Error generating download link: {str(e)}")
+        self._render()
+
+    def close(self):
+        """Renders any output still held back by the throttle."""
+        self._render(force=True)
+
+    def _render(self, force=False):
+        with self._lock:
+            # Only render on a time/size budget to limit Streamlit updates
+            if not self.buffer:
+                return
+            now = time.monotonic()
+            wait = self.flush_interval - (now - self._last_flush)
+            if not force and wait > 0 and self._pending_bytes <= self.flush_bytes:
+                # Show the held-back output once the interval has passed, even if
+                # nothing else is written (e.g. while waiting on an LLM call)
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._render, kwargs={"force": True})
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            buffer, self.buffer = self.buffer, deque(maxlen=self.buffer_limit)
+            self._pending_bytes = 0
+            self._last_flush = now
+
+            if get_script_run_ctx(suppress_warning=True) is None and self._ctx is not None:
+                add_script_run_ctx(threading.current_thread(), self._ctx)
+            # Each flush appends only the new output, so earlier output stays in place.
+            # Rendered under the lock so chunks from different threads keep their order
+            self.expander.markdown(''.join(buffer), unsafe_allow_html=True)
+
 
 def main():
     # Streamlit app
@@ -158,37 +93,87 @@ def main():
     project_description = st.text_area("Project Description")
     funding_amount = st.number_input("Desired Funding Amount", min_value=0)
     websites = st.text_area("Enter specific website links for grant search (optional, one per line)")
+    download_format = st.selectbox("Download format", ["docx", "txt"])
 
     if st.button("Start Grant Research and Writing Process"):
         process_output_expander = st.expander("Processing Output:")
-        sys.stdout = StreamToExpander(process_output_expander)
+        process_output = StreamToExpander(process_output_expander)
+        sys.stdout = process_output
         if org_name and org_mission and project_description and funding_amount:
             input_data = {
                 "organization": org_name,
                 "mission": org_mission,
                 "project": project_description,
                 "funding": funding_amount,
-                "websites": websites.split('\n') if websites else []
+                "websites": parse_websites(websites)
             }
 
             # Create agents and tasks
-            researcher, analyzer, writer = create_agents(llm)
-            if researcher and analyzer and writer:
-                tasks = create_tasks(researcher, analyzer, writer)
-                grant_crew = Crew(agents=[researcher, analyzer, writer], tasks=tasks, verbose=True)
-
+            grant_crew = create_crew()
+            if grant_crew is not None:
                 # Run process and provide download link
-                result = run_grant_process(grant_crew, input_data)
+                result = asyncio.run(run_grant_process(grant_crew, input_data))
+                # Render any output still held back by the throttle
+                process_output.close()
                 if result:
                     st.subheader("Grant Research and Writing Results")
                     st.markdown(result)
 
                     # Provide file download option
-                    generate_download_link(result)
+                    render_download(result, fmt=download_format)
 
         else:
             st.error("Please fill in all the required fields before starting the process.")
-            
-            
+
+    # Batch input: one organization per row
+    st.subheader("Batch Processing")
+    batch_file = st.file_uploader(
+        "Batch CSV (columns: organization, mission, project, funding, websites)",
+        type="csv"
+    )
+
+    if batch_file is not None and st.button("Start Batch Process"):
+        process_output_expander = st.expander("Processing Output:")
+        process_output = StreamToExpander(process_output_expander)
+        sys.stdout = process_output
+        try:
+            df = pd.read_csv(batch_file).fillna("")
+        except Exception as e:
+            st.error(f"Error reading batch CSV: {str(e)}")
+            return
+
+        required = {"organization", "mission", "project", "funding"}
+        missing = required - set(df.columns)
+        if missing:
+            st.error(f"Batch CSV is missing columns: {', '.join(sorted(missing))}")
+            return
+
+        inputs = []
+        invalid_rows = []
+        for i, row in enumerate(df.to_dict(orient="records"), start=1):
+            # Apply the same required-field check as the single run
+            if not all(str(row[field]).strip() for field in required) or not row["funding"]:
+                invalid_rows.append(i)
+                continue
+            inputs.append({
+                "organization": row["organization"],
+                "mission": row["mission"],
+                "project": row["project"],
+                "funding": row["funding"],
+                "websites": parse_websites(str(row.get("websites", "")))
+            })
+
+        if invalid_rows:
+            st.warning(f"Skipping rows with missing required fields: {', '.join(map(str, invalid_rows))}")
+        if not inputs:
+            st.error("The batch CSV has no rows with all required fields filled in.")
+            return
+
+        results = asyncio.run(run_batch_process(inputs))
+        process_output.close()
+        if results:
+            generate_batch_download_link(inputs, results)
+
+
 if __name__ == "__main__":
     main()
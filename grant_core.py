@@ -0,0 +1,231 @@
+import streamlit as st
+import pandas as pd
+from crewai import Agent, Task, Crew
+from langchain.chat_models import ChatOpenAI
+import os
+import asyncio
+from docx import Document
+from crewai_tools import (
+    SerperDevTool,
+    ScrapeWebsiteTool,
+)
+import io
+import json
+import hashlib
+from diskcache import Cache
+
+os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+os.environ["SERPER_API_KEY"] =os.getenv("SERPER_API_KEY")
+
+# Initialize language models once per process, not on every script rerun.
+# The small fast model runs the researcher's search/scrape tool loop; the
+# larger model is only used by the tool-less writer for the final generation.
+@st.cache_resource
+def get_llm():
+    return ChatOpenAI(model_name="gpt-4o-mini")
+
+@st.cache_resource
+def get_writer_llm():
+    return ChatOpenAI(model_name="gpt-4o")
+
+# Persistent cache for tool results, shared across runs and reruns
+SEARCH_CACHE_TTL = 24 * 60 * 60
+SCRAPE_CACHE_TTL = 7 * 24 * 60 * 60
+_tool_cache = Cache(".tool_cache")
+
+def _cached_run(run, ttl, key_parts, is_cacheable=lambda result: True):
+    """Returns a cached tool result for `key_parts`, calling `run` on a miss.
+
+    Exceptions from `run` propagate and results rejected by `is_cacheable` are
+    returned without being stored, so failures are retried on the next call.
+    """
+    key = hashlib.sha256(json.dumps(key_parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    result = _tool_cache.get(key)
+    if result is None:
+        result = run()
+        if is_cacheable(result):
+            _tool_cache.set(key, result, expire=ttl)
+    return result
+
+def _is_serper_success(result):
+    # Serper quota/auth failures come back as a JSON body with a status code
+    return not (isinstance(result, dict) and ("statusCode" in result or "error" in result))
+
+class CachedSerperDevTool(SerperDevTool):
+    def _run(self, **kwargs):
+        return _cached_run(lambda: super(CachedSerperDevTool, self)._run(**kwargs),
+                           SEARCH_CACHE_TTL, [self.name, kwargs], _is_serper_success)
+
+class CachedScrapeWebsiteTool(ScrapeWebsiteTool):
+    def _run(self, **kwargs):
+        website_url = kwargs.get("website_url", self.website_url)
+        return _cached_run(lambda: super(CachedScrapeWebsiteTool, self)._run(**kwargs),
+                           SCRAPE_CACHE_TTL, [self.name, website_url])
+
+# Define tools
+@st.cache_resource
+def get_tools():
+    return [CachedSerperDevTool(), CachedScrapeWebsiteTool()]
+
+# Number of organizations processed at the same time in batch runs
+BATCH_MAX_CONCURRENCY = 4
+
+def create_agents(llm, writer_llm=None):
+    """Creates and returns agents with predefined roles and goals."""
+    try:
+        researcher = Agent(
+            role='Grant Researcher',
+            goal='Find suitable grants for the organization',
+            backstory="You are an expert in finding and analyzing grant opportunities.",
+            tools=get_tools(),
+            verbose=True,
+            llm=llm
+        )
+
+        writer = Agent(
+            role='Grant Writer',
+            goal='Analyze grant fit and write compelling grant applications',
+            backstory="You are a skilled grant writer with a track record of successful applications and an expert in assessing organizational eligibility.",
+            tools=[],
+            verbose=True,
+            llm=writer_llm or llm
+        )
+        return researcher, writer
+    except Exception as e:
+        st.error(f"Error creating agents: {str(e)}")
+        return None, None
+
+def create_tasks(researcher, writer):
+    """Creates and returns tasks for each agent."""
+    try:
+        research_task = Task(
+            description="Research and identify suitable grants based on the organization's profile and needs. Organization: {organization}, Mission: {mission}, Project: {project}, Funding Needed: ${funding}. Use the provided website links: {websites} if available, otherwise search randomly. Also find similar successful grant applications from the web.",
+            agent=researcher,
+            expected_output="A list of at least 3 potential grants with their names, funding amounts, brief descriptions, eligibility criteria, website links, and application deadlines. Also give a list of Grant Websites Direct URL to grant opportunity, and Grant Application Reference Websites URLs of successful grant application examples with key insights from each"
+        )
+
+        # Analysis needs no tools, so the writer does it in the same generation
+        # as the application instead of in a separate dependent task
+        writing_task = Task(
+            description="Analyze the identified grants for eligibility and fit with the organization, using the insights from the similar successful applications found during research. Then write a compelling grant application for the best-fitting grant opportunity based on its requirements and your analysis. Organization: {organization}, Mission: {mission}, Project: {project}, Funding Needed: ${funding}",
+            agent=writer,
+            expected_output="A detailed analysis of each grant, including eligibility criteria, alignment with organization goals, probability of success, and insights from similar successful applications, with Grant Application Reference Websites URLs of successful grant application examples. Followed by a comprehensive, detailed grant application draft for the selected grant, including an executive summary, project description, budget overview, expected outcomes, and any specific sections required by the grant guidelines. Also Source Links (URLs) of the target grant"
+        )
+        return [research_task, writing_task]
+    except Exception as e:
+        st.error(f"Error creating tasks: {str(e)}")
+        return []
+
+def create_crew():
+    """Builds a fresh crew for one run from the cached LLMs and tools."""
+    researcher, writer = create_agents(get_llm(), get_writer_llm())
+    if not (researcher and writer):
+        return None
+    tasks = create_tasks(researcher, writer)
+    return Crew(agents=[researcher, writer], tasks=tasks, verbose=True)
+
+def parse_websites(websites):
+    """Splits user-entered website links into a list, dropping blank lines."""
+    return [w.strip() for w in websites.splitlines() if w.strip()]
+
+async def run_grant_process(grant_crew, input_data):
+    """Runs the grant research and writing process."""
+    try:
+        with st.spinner("Processing... This may take a few minutes."):
+            result = await grant_crew.kickoff_async(inputs=input_data)
+        st.success("Process completed!")
+        return result
+    except Exception as e:
+        st.error(f"An error occurred during the process: {str(e)}")
+        return None
+
+async def run_batch_process(inputs, max_concurrency=BATCH_MAX_CONCURRENCY):
+    """Runs the grant process for every organization in `inputs`, `max_concurrency` at a time."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(input_data):
+        async with semaphore:
+            # Crews are built lazily so only `max_concurrency` exist at once
+            grant_crew = create_crew()
+            if grant_crew is None:
+                return "Error creating agents and tasks"
+            try:
+                return await grant_crew.kickoff_async(inputs=input_data)
+            except Exception as e:
+                return f"An error occurred during the process: {str(e)}"
+
+    with st.spinner(f"Processing {len(inputs)} organizations... This may take a while."):
+        results = await asyncio.gather(*(run_one(input_data) for input_data in inputs))
+    st.success("Batch process completed!")
+    return results
+
+def generate_batch_download_link(inputs, results):
+    """Generates a download link for batch results in CSV format."""
+    try:
+        df = pd.DataFrame({
+            "organization": [row["organization"] for row in inputs],
+            "result": [str(result) for result in results],
+        })
+        st.download_button(
+            label="Download Batch Results as CSV",
+            data=df.to_csv(index=False).encode("utf-8"),
+            file_name="grant_results.csv",
+            mime="text/csv"
+        )
+    except Exception as e:
+        st.error(f"Error generating batch download link: {str(e)}")
+
+def render_download(result, fmt="docx"):
+    """Renders a download button for the result in the requested format ("txt" or "docx")."""
+    if fmt == "txt":
+        _render_txt_download(result)
+    elif fmt == "docx":
+        _render_docx_download(result)
+    else:
+        st.error(f"Unsupported download format: {fmt}")
+
+def _render_txt_download(result):
+    """Generates a download link for the result as a plain text file."""
+    try:
+        st.download_button(
+            label="Download Results",
+            data=str(result).encode("utf-8"),
+            file_name="grant_results.txt",
+            mime="text/plain; charset=utf-8"
+        )
+    except Exception as e:
+        st.error(f"Error generating download link: {str(e)}")
+
+def _render_docx_download(result):
+    """Generates a download link for the result in a Word document format."""
+    try:
+        # Create a Word document
+        doc = Document()
+        doc.add_heading("Grant Research and Writing Results", level=1)
+
+        # Check if `result` is structured as a dictionary or a list
+        if isinstance(result, dict):
+            for section, content in result.items():
+                doc.add_heading(section, level=2)
+                doc.add_paragraph(str(content))  # Ensure content is a string
+        elif isinstance(result, (list, tuple)):
+            for item in map(str, result):  # Convert each item to a string if needed
+                doc.add_paragraph(item)
+        else:
+            doc.add_paragraph(str(result))  # Ensure `result` is a string if it’s a single output
+
+        # Save document to an in-memory file
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        data = buffer.getvalue()
+        del doc, buffer
+
+        # Provide download link for Word document
+        st.download_button(
+            label="Download Results as Word Document",
+            data=data,
+            file_name="grant_results.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+    except Exception as e:
+        st.error(f"Error generating download link: {str(e)}")